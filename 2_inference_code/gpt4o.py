@@ -9,8 +9,8 @@ Prerequisites:
 1. An OpenAI API key must be available as the environment variable `OPENAI_API_KEY`.
 2. The MIRP Benchmark dataset must be downloaded locally.
 3. Required Python packages:
-    - Built-in: `os`, `sys`, `json`, `random`, `time`, `io`, `base64`
-    - External: `openai`, `PIL` (from Pillow)
+    - Built-in: `os`, `sys`, `random`, `time`, `io`, `base64`, `asyncio`, `collections`, `concurrent.futures`, `functools`, `math`, `hashlib`, `shelve`, `tempfile`
+    - External: `openai` (with `httpx`), `PIL` (from Pillow), `numpy`, `orjson`, `tenacity`, `tiktoken`
 
 
 Usage Instructions:
@@ -19,6 +19,18 @@ Usage Instructions:
    1.1 Set `dataset_dir` to the path where your dataset is stored.
    1.2 Set `RESULTS_ROOT` to the directory where you want to save the results.
    1.3 Select the experiment you want to run in the `experiments` list (e.g., ['RQ2']).
+   1.4 Set `CONCURRENCY` to the number of API requests that may be in flight at the same time.
+       Set `MAX_REQUESTS_PER_MINUTE` and `MAX_TOKENS_PER_MINUTE` to the rate limits of your account.
+   1.5 Optional: set `IMAGE_FORMAT = "JPEG"` at the top of the script to upload smaller,
+       lossy JPEGs instead of PNGs. Our results were produced with PNG.
+   1.6 Optional: set `USE_RESPONSE_CACHE = True` to store every answer on disk (`RESULTS_ROOT/.cache`)
+       and reuse it for identical requests, so re-running the script costs nothing.
+       Note that cached answers also make repeated runs with identical requests identical.
+   1.7 Set `USE_BATCH_API = True` to submit all runs as OpenAI Batch API jobs instead
+       (about half the cost, no rate limits, but results can take up to 24 hours).
+       The requests are split into as many batches as the 200 MB / 50,000 requests
+       limit per input file requires. Failed requests are submitted once more; requests
+       that still fail are saved with an empty `model_answer` and an `error` message.
 2. Run the script.
 3. For each task, a dedicated results folder will be created, and responses will be saved in
    JSON format for each run (3 runs per task by default).
@@ -26,14 +38,20 @@ Usage Instructions:
 
 Functionality Summary:
 1. QA Data Extraction:
-   - Loads question-answer pairs from JSON files for each task.
+   - Loads question-answer pairs from JSON files for each task (once, indexed by filename).
    - Uses either random sampling or the full dataset, depending on configuration.
 2. Image Processing:
    - Converts images to RGB format if necessary.
    - Encodes images in base64 format for API compatibility.
+   - All images are encoded once, in parallel on all CPU cores, and reused across the runs.
 3. API Call Execution:
    - Constructs structured prompts for binary QA tasks.
    - Sends image + question to GPT-4o via OpenAI's API.
+   - Requests of one run are sent concurrently (bounded by `CONCURRENCY`); the results keep the image order.
+   - Requests are throttled to the account's RPM/TPM limits (tokens estimated with `tiktoken`
+     and OpenAI's image token formula) and retried with exponential
+     backoff on rate-limit errors, timeouts and server errors.
+   - A single client with a connection pool is shared by all runs, so connections stay open.
    - Collects and records the model’s responses.
 4. Results Storage:
    - Responses are saved in structured JSON files.
@@ -46,22 +64,37 @@ Notes:
 """
 
 
+import asyncio
 import base64
+import hashlib
+import shelve
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import httpx
 import openai
 import os
 from io import BytesIO
 from PIL import Image
-import json
+import numpy as np
+import orjson
 import sys
+import math
 import random
 import time
+import tiktoken
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+IMAGE_FORMAT = "PNG"  # "PNG" (lossless, used for our results) or "JPEG" (quality 90, smaller payload)
+
 
 def encode_image_from_bytes(image):
     """
-    Encodes an image object into a base64-encoded PNG string.
+    Encodes an image object into a base64-encoded PNG string
+    (or JPEG with quality 90 if `IMAGE_FORMAT` is "JPEG").
 
     Args:
         image (PIL.Image.Image): The image to encode.
@@ -80,7 +113,10 @@ def encode_image_from_bytes(image):
         ```
     """
     buffered = BytesIO()
-    image.save(buffered, format="PNG")
+    if IMAGE_FORMAT == "JPEG":
+        image.save(buffered, format="JPEG", quality=90)
+    else:
+        image.save(buffered, format="PNG")
     return base64.b64encode(buffered.getvalue()).decode("utf-8")
 
 
@@ -122,8 +158,8 @@ def normalize_16bit_to_8bit(image):
         PIL.Image.Image: An 8-bit grayscale image (mode "L").
 
     The function scales pixel values from the 16-bit range (0-65535) to the 
-    8-bit range (0-255) by dividing each pixel by 256 and then converting 
-    the image to mode "L".
+    8-bit range (0-255) by shifting each pixel right by 8 bits (integer division 
+    by 256) in a single NumPy pass and building a mode "L" image from the result.
 
     Example:
         ```python
@@ -134,9 +170,8 @@ def normalize_16bit_to_8bit(image):
         img_8bit.save("example_8bit.png")
         ```
     """
-    normalized_image = image.point(
-        lambda x: (x / 256))
-    return normalized_image.convert("L")
+    pixels = np.asarray(image, dtype=np.uint16)
+    return Image.fromarray((pixels >> 8).astype(np.uint8), mode="L")
 
 
 def ensure_rgb(image):
@@ -191,8 +226,10 @@ def get_clean_image(image_path):
 
     This function performs the following steps:
     1. Opens the image from the given path.
-    2. Converts it to RGB mode if necessary using `ensure_rgb()`.
-    3. Encodes the processed image into a base64 string using `encode_image_from_bytes()`.
+    2. If the file already is an RGB image in `IMAGE_FORMAT`, its bytes are
+       base64-encoded directly (nothing would change by decoding and re-encoding it).
+    3. Otherwise converts it to RGB mode using `ensure_rgb()`.
+    4. Encodes the processed image into a base64 string using `encode_image_from_bytes()`.
 
     Example:
         ```python
@@ -201,76 +238,78 @@ def get_clean_image(image_path):
         ```
     """
     with Image.open(image_path) as img:
+        if img.mode == "RGB" and img.format == IMAGE_FORMAT:
+            with open(image_path, 'rb') as file:
+                return base64.b64encode(file.read()).decode("utf-8")
         rgb_image = ensure_rgb(img)
     base64_image = encode_image_from_bytes(rgb_image)
 
     return base64_image
 
 
-def get_qa(img_file_name, json_dir):
+def get_image_url(image_path):
     """
-    Retrieves the question-answer pairs for a given image file from a JSON dataset.
+    Builds the data URL (`data:image/...;base64,...`) of an image for the API request.
 
     Args:
-        img_file_name (str): The filename of the image for which QA pairs are required.
-        json_dir (str): The path to the JSON file containing question-answer data.
+        image_path (str): The file path to the image.
 
     Returns:
-        list[dict]: A list of dictionaries, each containing a 'question' and an 'answer'.
+        str: The data URL containing the base64-encoded image from `get_clean_image()`.
 
-    The function performs the following steps:
-    1. Loads the JSON file from the provided directory.
-    2. Finds the entry that matches the given image filename.
-    3. Extracts and returns the associated question-answer pairs.
+    The URL is built once per image and then shared by all requests of all runs.
+    """
+    return f"data:image/{IMAGE_FORMAT.lower()};base64,{get_clean_image(image_path)}"
+
+
+def get_qa_index(data):
+    """
+    Indexes the question-answer pairs of a JSON dataset by image filename.
+
+    Args:
+        data (list[dict]): The loaded content of the JSON file containing question-answer data.
+
+    Returns:
+        dict[str, list[dict]]: Maps every image filename to a list of dictionaries,
+            each containing a 'question' and an 'answer'.
+
+    The JSON file is loaded once per sub-experiment; afterwards the QA pairs of an
+    image are a single dictionary lookup instead of a file read and a linear scan.
 
     Example:
         ```python
-        qa_pairs = get_qa("image_001.jpg", "questions.json")
-        for qa in qa_pairs:
+        with open("questions.json", 'rb') as file:
+            qa_index = get_qa_index(orjson.loads(file.read()))
+        for qa in qa_index["image_001.jpg"]:
             print(f"Q: {qa['question']}\nA: {qa['answer']}")
         ```
     """
-    with open(json_dir, 'r', encoding='utf-8') as file:
-        data = json.load(file)
+    return {entry['filename']: [{'question': qa['question'],
+                                 'answer': qa['answer']} for qa in entry['question_answer']]
+            for entry in data if 'filename' in entry}
 
-    target_filename = img_file_name
-    result = next((entry['question_answer']
-                   for entry in data if entry['filename'] == target_filename), None)
 
-    questions_answers = [{'question': entry['question'],
-                          'answer': entry['answer']} for entry in result]
-    return questions_answers
-
-
-def make_better_api_call(questions_data, base64_image, additional_question):
+def build_request_body(questions_data, image_url, additional_question):
     """
-    Sends a structured API call to OpenAI's GPT model with a medical image 
-    and a question about its content.
+    Builds the chat completion request body for a medical image and a question about its content.
 
     Args:
         questions_data (dict): A dictionary containing:
             - 'question' (str): The question to ask about the image.
             - 'answer' (str): The expected answer.
-        base64_image (str): A base64-encoded PNG image of a 2D axial CT scan.
+        image_url (str): The base64 data URL (see `get_image_url()`) of a 2D axial CT scan.
         additional_question (dict): A dictionary containing:
             - 'question' (str): A sample question to demonstrate the response format.
             - 'answer' (str): The expected response format ('1' or '0').
 
     Returns:
-        list[dict]: A list containing a single dictionary with:
-            - 'question' (str): The question asked.
-            - 'model_answer' (str): The AI-generated answer.
-            - 'expected_answer' (str): The expected answer for comparison.
-            - 'entire_prompt' (str): The full prompt used in the API call.
+        tuple[dict, str]: The keyword arguments for `chat.completions.create` and the text prompt.
 
     The function constructs a strict yes/no prompt for the model, ensuring 
-    a binary response ('1' for Yes, '0' for No). It sends the image in base64 
-    format along with the textual question. The model response is then stored 
-    along with the original question and expected answer.
+    a binary response ('1' for Yes, '0' for No). The same body is used for the
+    live API calls and for the lines of a Batch API input file.
     """
 
-    results = []
-
     prompt = (
         "The image is a 2D axial slice of an abdominal CT scan with soft tissue windowing. "
         "Answer strictly with '1' for Yes or '0' for No. No explanations, no additional text. "
@@ -290,24 +329,189 @@ def make_better_api_call(questions_data, base64_image, additional_question):
         },
         {
             "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{base64_image}", "detail": "high"}
+            "image_url": {"url": image_url, "detail": "high"}
         }
     ]
 
-    
     # ──────────────────────────────────────────────────────────────────────────────
     #  Model
     # ──────────────────────────────────────────────────────────────────────────────
-    response = openai.chat.completions.create(
-        model="gpt-4o-2024-08-06",
-        messages=[
+    body = {
+        "model": "gpt-4o-2024-08-06",
+        "messages": [
             {"role": "user", "content": messages}
         ],
-        temperature=0
-    )
+        "temperature": 0
+    }
     # ──────────────────────────────────────────────────────────────────────────────
 
-    model_answer = response.choices[0].message.content
+    return body, prompt
+
+
+class RateLimiter:
+    """
+    Keeps the API calls below the requests and tokens per minute of the account.
+
+    Args:
+        max_requests_per_minute (int): The request limit (RPM) of the account.
+        max_tokens_per_minute (int): The token limit (TPM) of the account.
+
+    Every admitted request is recorded as `(timestamp, tokens)` in a rolling window
+    of the last 60 seconds. `acquire()` waits until one more request and its
+    estimated tokens fit into that window and then records them. All tasks run on
+    the same event loop, so the check and the reservation cannot interleave.
+
+    Example:
+        ```python
+        rate_limiter = RateLimiter(500, 30000)
+        await rate_limiter.acquire(1200)
+        ```
+    """
+
+    def __init__(self, max_requests_per_minute, max_tokens_per_minute):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.window = deque()
+        self.window_tokens = 0
+
+    def expire(self, now):
+        while self.window and now - self.window[0][0] >= 60.0:
+            _, tokens = self.window.popleft()
+            self.window_tokens -= tokens
+
+    async def acquire(self, n_tokens):
+        while True:
+            now = time.monotonic()
+            self.expire(now)
+            if (len(self.window) < self.max_requests_per_minute
+                    and (self.window_tokens + n_tokens <= self.max_tokens_per_minute or not self.window)):
+                self.window.append((now, n_tokens))
+                self.window_tokens += n_tokens
+                return
+            await asyncio.sleep(0.1)
+
+
+def get_image_tokens(image_path):
+    """
+    Calculates the input tokens of an image sent with `"detail": "high"`.
+
+    Args:
+        image_path (str): The file path to the image.
+
+    Returns:
+        int: 85 base tokens plus 170 tokens per 512x512 tile.
+
+    OpenAI first scales the image to fit into 2048x2048 and then scales it down so
+    that the shortest side is at most 768 pixels, before counting the tiles.
+    Only the image header is read.
+    """
+    with Image.open(image_path) as img:
+        width, height = img.size
+
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """
+    Returns the `tiktoken` encoding of GPT-4o. Created on first use, because loading it may
+    download the encoding file; importing the script (e.g. in the image worker processes
+    or in Batch API mode, which needs no token estimates) does not need it.
+    """
+    return tiktoken.encoding_for_model("gpt-4o")
+
+
+def estimate_tokens(prompt, n_image_tokens):
+    """
+    Estimates the input tokens of a request: the text prompt counted with `tiktoken`
+    plus the tokens of the image (see `get_image_tokens()`).
+    """
+    return len(get_encoding().encode(prompt)) + n_image_tokens
+
+
+def get_cache_key(body):
+    """
+    Returns the key of a request in the response cache: the SHA-256 of the whole
+    request body (model, prompt, image and parameters).
+    """
+    return hashlib.sha256(orjson.dumps(body, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+@retry(wait=wait_random_exponential(min=1, max=60), stop=stop_after_attempt(6),
+       retry=retry_if_exception_type((openai.RateLimitError, openai.APIConnectionError,
+                                      openai.InternalServerError)),
+       reraise=True)
+async def create_chat_completion(client, rate_limiter, body, n_tokens):
+    """
+    Waits for free capacity and sends the request; retried with exponential backoff
+    on rate-limit errors, timeouts/connection errors and server errors.
+    (The client itself is created with `max_retries=0`, all retries happen here.)
+    After the last attempt the original OpenAI error is raised.
+    """
+    await rate_limiter.acquire(n_tokens)
+    return await client.chat.completions.create(**body)
+
+
+async def make_better_api_call(client, rate_limiter, questions_data, image_url, n_image_tokens, additional_question,
+                               response_cache=None):
+    """
+    Sends a structured API call to OpenAI's GPT model with a medical image 
+    and a question about its content.
+
+    Args:
+        client (openai.AsyncOpenAI): The asynchronous OpenAI client used for the request.
+        rate_limiter (RateLimiter): Keeps the call within the account's RPM/TPM limits.
+        questions_data (dict): A dictionary containing:
+            - 'question' (str): The question to ask about the image.
+            - 'answer' (str): The expected answer.
+        image_url (str): The base64 data URL (see `get_image_url()`) of a 2D axial CT scan.
+        n_image_tokens (int): The input tokens of the image, used for the TPM estimate.
+        additional_question (dict): A dictionary containing:
+            - 'question' (str): A sample question to demonstrate the response format.
+            - 'answer' (str): The expected response format ('1' or '0').
+        response_cache (shelve.Shelf | None): Answers of earlier identical requests (see `get_cache_key()`).
+            If given, a cached answer is returned without calling the API.
+
+    Returns:
+        list[dict]: A list containing a single dictionary with:
+            - 'question' (str): The question asked.
+            - 'model_answer' (str): The AI-generated answer.
+            - 'expected_answer' (str): The expected answer for comparison.
+            - 'entire_prompt' (str): The full prompt used in the API call.
+            - 'error' (str): Only if the request failed (not retried, or out of retries);
+              'model_answer' is then empty.
+
+    The request is built with `build_request_body()`. It sends the image as a base64 
+    data URL along with the textual question. The model response is then stored 
+    along with the original question and expected answer. A failed request is stored
+    the same way as failed Batch API requests, so one error does not lose the whole run.
+    """
+
+    results = []
+
+    body, prompt = build_request_body(questions_data, image_url, additional_question)
+
+    cache_key = get_cache_key(body) if response_cache is not None else None
+    error = None
+
+    if cache_key is not None and cache_key in response_cache:
+        model_answer = response_cache[cache_key]
+    else:
+        try:
+            response = await create_chat_completion(
+                client, rate_limiter, body, estimate_tokens(prompt, n_image_tokens))
+        except openai.OpenAIError as e:
+            model_answer, error = "", f"{type(e).__name__}: {e}"
+        else:
+            model_answer = response.choices[0].message.content
+
+            if cache_key is not None:
+                response_cache[cache_key] = model_answer
 
     results.append({
         "question": questions_data['question'],
@@ -315,10 +519,357 @@ def make_better_api_call(questions_data, base64_image, additional_question):
         "expected_answer": questions_data['answer'],
         "entire_prompt": prompt
     })
+    if error is not None:
+        results[0]["error"] = error
 
     return results
 
 
+def pick_other_image(png_images, idx):
+    """
+    Randomly picks an image other than `png_images[idx]` for the example question.
+
+    Args:
+        png_images (list[str]): The image filenames (at least two).
+        idx (int): The index of the current image.
+
+    Returns:
+        str: The filename of the picked image.
+
+    Draws an index from the N-1 other positions and skips over `idx`, instead of
+    building the list of all other images. `random.choice` on that list draws
+    `randrange(N-1)` as well, so the same seed picks the same images.
+    """
+    j = random.randrange(len(png_images) - 1)
+    if j >= idx:
+        j += 1
+    return png_images[j]
+
+
+def pick_example_questions(png_images, qa_index, n_runs):
+    """
+    Draws the example question of every image for all runs, before any request is sent.
+
+    Args:
+        png_images (list[str]): The image filenames to process.
+        qa_index (dict[str, list[dict]]): The QA pairs per image filename (see `get_qa_index()`).
+        n_runs (int): The number of runs over the dataset.
+
+    Returns:
+        list[list[list[dict] | None]]: For every run, the QA pairs of the picked example image
+            per image (same order as `png_images`), or None if there is no other image.
+
+    The picks are drawn run by run and image by image, exactly as in the sequential loop.
+    Drawing them all upfront keeps them independent of anything else that uses the global
+    `random` module while the requests run, e.g. the random jitter of the retries
+    (`wait_random_exponential`), so the same seed always gives the same prompts.
+    """
+    return [[qa_index[pick_other_image(png_images, idx)] if len(png_images) > 1 else None
+             for idx in range(len(png_images))]
+            for _ in range(n_runs)]
+
+
+async def run_dataset(client, png_images, qa_index, image_urls, image_tokens, example_questions, concurrency,
+                      rate_limiter, response_cache=None):
+    """
+    Runs one pass over the dataset, sending the API calls concurrently.
+
+    Args:
+        client (openai.AsyncOpenAI): The shared asynchronous OpenAI client.
+        png_images (list[str]): The image filenames to process.
+        qa_index (dict[str, list[dict]]): The QA pairs per image filename (see `get_qa_index()`).
+        image_urls (dict[str, str]): The base64 data URL of the image per filename.
+        image_tokens (dict[str, int]): The input tokens of the image per filename.
+        example_questions (list[list[dict] | None]): The example QA pairs per image for this run
+            (one run of `pick_example_questions()`).
+        concurrency (int): The maximum number of API requests in flight at the same time.
+        rate_limiter (RateLimiter): Keeps the calls within the account's RPM/TPM limits.
+        response_cache (shelve.Shelf | None): Optional on-disk cache of earlier answers.
+
+    Returns:
+        list[dict]: One entry per image with 'file_name' and 'results_call',
+            in the same order as `png_images`. Failed requests have an empty
+            'model_answer' and an 'error' (see `make_better_api_call()`).
+
+    The example questions are drawn with `pick_example_questions()` before any request
+    is sent, so the sampled examples are identical to a sequential run, also when
+    requests are retried.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    dataset_results = [None] * len(png_images)
+
+    async def process_one(idx, image, additional_question):
+        async with semaphore:
+            # Every image of the benchmark has exactly one QA pair, so one call per
+            # image is already the minimum. Questions are not packed into a shared
+            # prompt, as that would change the benchmark prompt.
+            question_data = qa_index[image]
+
+            results_call = await make_better_api_call(
+                client, rate_limiter, question_data[0], image_urls[image], image_tokens[image],
+                additional_question=additional_question[0], response_cache=response_cache)
+
+            dataset_results[idx] = {
+                "file_name": image,
+                "results_call": results_call
+            }
+
+    tasks = [process_one(idx, image, example_questions[idx])
+             for idx, image in enumerate(png_images)]
+
+    await asyncio.gather(*tasks)
+
+    n_failed = sum("error" in entry["results_call"][0] for entry in dataset_results)
+    if n_failed:
+        print(f"{n_failed} requests failed and are saved without an answer.")
+
+    return dataset_results
+
+
+# limits of one Batch API input file: 200 MB and 50,000 requests (some headroom on the size)
+MAX_BATCH_FILE_BYTES = 190 * 1024 * 1024
+MAX_BATCH_FILE_REQUESTS = 50000
+
+BATCH_FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+def iter_batch_files(requests, out_dir):
+    """
+    Writes Batch API requests to as many JSONL input files as the file limits require.
+
+    Args:
+        requests (iterable[tuple[str, dict]]): The `(custom_id, body)` of every request.
+        out_dir (str): The directory the input files are written to.
+
+    Yields:
+        str: The path of every input file, as soon as it is complete.
+
+    A new file is started whenever the next line would exceed `MAX_BATCH_FILE_BYTES`
+    or the current file already holds `MAX_BATCH_FILE_REQUESTS` requests. Yielding the
+    files one by one lets the caller upload and delete each of them before the next
+    one is written, so only one input file is on disk at a time.
+    """
+    batch_file = None
+    n_bytes = n_lines = n_files = 0
+
+    for custom_id, body in requests:
+        line = orjson.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body
+        }) + b"\n"
+
+        if batch_file is not None and (n_bytes + len(line) > MAX_BATCH_FILE_BYTES
+                                       or n_lines >= MAX_BATCH_FILE_REQUESTS):
+            batch_file.close()
+            yield batch_file.name
+            batch_file = None
+
+        if batch_file is None:
+            batch_file = open(os.path.join(out_dir, f"batch_input_{n_files}.jsonl"), 'wb')
+            n_files += 1
+            n_bytes = n_lines = 0
+
+        batch_file.write(line)
+        n_bytes += len(line)
+        n_lines += 1
+
+    if batch_file is not None:
+        batch_file.close()
+        yield batch_file.name
+
+
+def get_batch_error(record):
+    """
+    Returns a short error message for a failed line of a Batch API output or error file.
+    """
+    if record.get("error"):
+        return record["error"].get("message") or str(record["error"])
+    response = record.get("response") or {}
+    error = (response.get("body") or {}).get("error") or {}
+    return error.get("message") or f"status code {response.get('status_code')}"
+
+
+def submit_batches(client, requests, poll_interval):
+    """
+    Submits requests as Batch API jobs and waits for their results.
+
+    Args:
+        client (openai.OpenAI): The synchronous OpenAI client.
+        requests (iterable[tuple[str, dict]]): The `(custom_id, body)` of every request.
+        poll_interval (int): Seconds to wait between two status checks of the batches.
+
+    Returns:
+        tuple[dict[str, str], dict[str, str], list]: The answer per `custom_id` of every
+            successful request, the error message per `custom_id` of every failed one,
+            and the finished batches.
+
+    The requests are written to JSONL files within the Batch API limits (see `iter_batch_files()`)
+    in a temporary directory, and every file is uploaded as its own batch and deleted right
+    after its upload. Once all batches have finished, the answers are collected from their
+    output files and the errors from their error files. Requests of a batch that did not
+    complete have no result and are reported as failed as well.
+    """
+    submitted = []
+    batches = []
+
+    def tracked_requests():
+        for custom_id, body in requests:
+            submitted.append(custom_id)
+            yield custom_id, body
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for path in iter_batch_files(tracked_requests(), tmp_dir):
+            with open(path, 'rb') as batch_file:
+                input_file = client.files.create(file=batch_file, purpose="batch")
+            os.remove(path)
+
+            batch = client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            print(f"Submitted batch {batch.id} ({os.path.basename(path)}).")
+            batches.append(batch)
+
+    if submitted:
+        print(f"Submitted {len(submitted)} requests in {len(batches)} batch(es).")
+
+    while any(batch.status not in BATCH_FINAL_STATES for batch in batches):
+        time.sleep(poll_interval)
+        batches = [batch if batch.status in BATCH_FINAL_STATES else client.batches.retrieve(batch.id)
+                   for batch in batches]
+
+    answers, errors = {}, {}
+    for batch in batches:
+        if batch.status != "completed":
+            print(f"Batch {batch.id} ended with status '{batch.status}'.")
+
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id is None:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    errors[record["custom_id"]] = get_batch_error(record)
+                else:
+                    answers[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+
+    for custom_id in submitted:
+        if custom_id not in answers and custom_id not in errors:
+            errors[custom_id] = "no result returned by the Batch API"
+
+    return answers, errors, batches
+
+
+def run_batch(png_images, qa_index, image_urls, example_questions, poll_interval=60, response_cache=None,
+              max_resubmits=1):
+    """
+    Runs all passes over the dataset as OpenAI Batch API jobs.
+
+    Args:
+        png_images (list[str]): The image filenames to process.
+        qa_index (dict[str, list[dict]]): The QA pairs per image filename (see `get_qa_index()`).
+        image_urls (dict[str, str]): The base64 data URL of the image per filename.
+        example_questions (list[list[list[dict] | None]]): The example QA pairs per run and image
+            (see `pick_example_questions()`); one run over the dataset per element.
+        poll_interval (int): Seconds to wait between two status checks of the batches.
+        response_cache (shelve.Shelf | None): Optional on-disk cache of earlier answers;
+            cached requests are not submitted again.
+        max_resubmits (int): How often failed requests are submitted again in a new batch.
+
+    Returns:
+        list[list[dict]]: For every run, one entry per image with 'file_name' and
+            'results_call', in the same order as `png_images`. Requests that still failed
+            after `max_resubmits` new attempts have an empty 'model_answer' and an 'error'.
+
+    The function performs the following steps:
+    1. Builds one request per (run, image) with the same body as the live API calls.
+       The example questions are the ones drawn by `pick_example_questions()`.
+    2. Submits them as Batch API jobs and waits for the results (see `submit_batches()`).
+    3. Maps each answer back to its run and image via `custom_id`.
+    4. Submits the failed requests again, up to `max_resubmits` times.
+
+    Raises:
+        RuntimeError: If none of the initial batches completed, so no answer came back at all.
+    """
+    client = openai.OpenAI(api_key=openai.api_key)
+
+    runs_results = [[None] * len(png_images) for _ in example_questions]
+
+    def store(i, idx, question_data, prompt, model_answer, error=None):
+        results_call = {
+            "question": question_data['question'],
+            "model_answer": model_answer,
+            "expected_answer": question_data['answer'],
+            "entire_prompt": prompt
+        }
+        if error is not None:
+            results_call["error"] = error
+        runs_results[i][idx] = {
+            "file_name": png_images[idx],
+            "results_call": [results_call]
+        }
+
+    pending = {}
+
+    def requests():
+        for i, run_examples in enumerate(example_questions):
+            for idx, image in enumerate(png_images):
+                question_data = qa_index[image]
+                additional_question = run_examples[idx]
+
+                body, prompt = build_request_body(
+                    question_data[0], image_urls[image], additional_question=additional_question[0])
+
+                cache_key = get_cache_key(body) if response_cache is not None else None
+                if cache_key is not None and cache_key in response_cache:
+                    store(i, idx, question_data[0], prompt, response_cache[cache_key])
+                    continue
+
+                custom_id = f"{image}_run_{i}"
+                pending[custom_id] = (i, idx, question_data[0], prompt, cache_key, body)
+                yield custom_id, body
+
+    answers, errors, batches = submit_batches(client, requests(), poll_interval)
+
+    if not pending:
+        print("All requests were answered from the response cache.")
+        return runs_results
+
+    if not any(batch.status == "completed" for batch in batches):
+        statuses = ", ".join(f"{batch.id}: {batch.status}" for batch in batches)
+        raise RuntimeError(f"No batch completed ({statuses}).")
+
+    error_file_ids = [batch.error_file_id for batch in batches if batch.error_file_id]
+
+    for attempt in range(max_resubmits + 1):
+        for custom_id, model_answer in answers.items():
+            i, idx, question_data, prompt, cache_key, _ = pending.pop(custom_id)
+            store(i, idx, question_data, prompt, model_answer)
+            if cache_key is not None:
+                response_cache[cache_key] = model_answer
+
+        if not pending or attempt == max_resubmits:
+            break
+
+        print(f"Submitting {len(pending)} failed requests again.")
+        answers, errors, batches = submit_batches(
+            client, [(custom_id, entry[5]) for custom_id, entry in pending.items()], poll_interval)
+        error_file_ids += [batch.error_file_id for batch in batches if batch.error_file_id]
+
+    if pending:
+        print(f"{len(pending)} batch requests failed and are saved without an answer "
+              f"(error files: {', '.join(error_file_ids) or 'none'}).")
+        for custom_id, (i, idx, question_data, prompt, _, _) in pending.items():
+            store(i, idx, question_data, prompt, "", error=errors.get(custom_id, "unknown error"))
+
+    return runs_results
+
 if __name__ == "__main__":
 
     # ──────────────────────────────────────────────────────────────────────────────
@@ -331,8 +882,34 @@ if __name__ == "__main__":
 
     experiments = ['RQ2']  # select the experiments here: 'RQ1', 'RQ2', 'RQ3', 'AS'
 
+    CONCURRENCY = 16  # number of API requests in flight at the same time
+
+    MAX_REQUESTS_PER_MINUTE = 500  # RPM limit of your account
+    MAX_TOKENS_PER_MINUTE = 30000  # TPM limit of your account
+
+    USE_RESPONSE_CACHE = False  # True: reuse answers of identical earlier requests from RESULTS_ROOT/.cache
+
+    USE_BATCH_API = False  # True: send all 3 runs as Batch API jobs (cheaper, results within 24h)
+
     # ──────────────────────────────────────────────────────────────────────────────
 
+    rate_limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE)
+
+    # one client (and one event loop) for all runs keeps the pooled connections alive
+    client = openai.AsyncOpenAI(
+        api_key=openai.api_key,
+        http_client=httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        max_retries=0  # retries are done by create_chat_completion()
+    )
+    loop = asyncio.new_event_loop()
+
+    response_cache = None
+    if USE_RESPONSE_CACHE:
+        os.makedirs(os.path.join(RESULTS_ROOT, '.cache'), exist_ok=True)
+        response_cache = shelve.open(os.path.join(RESULTS_ROOT, '.cache', 'responses'))
+
     for exp in experiments:
 
         if exp == 'RQ1':
@@ -362,12 +939,24 @@ if __name__ == "__main__":
 
             image_files_path = os.path.join(exp_dir, selected_image)
 
-            with open(qa_file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
+            with open(qa_file_path, 'rb') as file:
+                data = orjson.loads(file.read())
 
             png_images = [entry['filename']
                           for entry in data if 'filename' in entry]
 
+            qa_index = get_qa_index(data)
+
+            # load, convert and encode every image once, using all CPU cores
+            with ProcessPoolExecutor() as executor:
+                image_urls = dict(zip(png_images, executor.map(
+                    get_image_url,
+                    [os.path.join(image_files_path, image) for image in png_images],
+                    chunksize=8)))
+
+            image_tokens = {image: get_image_tokens(os.path.join(image_files_path, image))
+                            for image in png_images}
+
             random.seed(2025)
 
             N = len(png_images)  # number or len(png_images)
@@ -384,35 +973,26 @@ if __name__ == "__main__":
                 png_images = random.sample(png_images, N)
                 mo_file_name_appendix = f'random_pick_{N}_images'
 
-            for i in range(3):  # how many runs ?
-                start_time = time.time()
-
-                dataset_results = []
+            N_RUNS = 3  # how many runs ?
 
-                for image in png_images:
-                    question_data = get_qa(image, qa_file_path)
+            # drawn before any request, so retries cannot change the picks (see pick_example_questions)
+            example_questions = pick_example_questions(png_images, qa_index, N_RUNS)
 
-                    other_images = [
-                        img for img in png_images if img != image]
-                    if other_images:
-                        random_other_image = random.choice(other_images)
-                        additional_question = get_qa(
-                            random_other_image, qa_file_path)
-                    else:
-                        additional_question = None
-
-                    original_image_path = os.path.join(
-                        image_files_path, image)
-
-                    base64_image = get_clean_image(original_image_path)
+            if USE_BATCH_API:
+                start_time = time.time()
+                batch_results = run_batch(
+                    png_images, qa_index, image_urls, example_questions, response_cache=response_cache)
+                print(f"Batch runtime for {selected_qa.replace('.json', '')} with {selected_image} : {time.time() - start_time:.2f} seconds")
 
-                    results_call = make_better_api_call(
-                        question_data[0], base64_image, additional_question=additional_question[0])
+            for i in range(N_RUNS):
+                start_time = time.time()
 
-                    dataset_results.append({
-                        "file_name": image,
-                        "results_call": results_call
-                    })
+                if USE_BATCH_API:
+                    dataset_results = batch_results[i]
+                else:
+                    dataset_results = loop.run_until_complete(
+                        run_dataset(client, png_images, qa_index, image_urls, image_tokens, example_questions[i],
+                                    CONCURRENCY, rate_limiter, response_cache=response_cache))
 
                 results_file_name = f"{selected_qa.replace('.json', '')}_{mo_file_name_appendix}_run_{i}.json"
 
@@ -422,11 +1002,17 @@ if __name__ == "__main__":
                 # Ensure the directory exists
                 os.makedirs(os.path.dirname(save_name), exist_ok=True)
 
-                with open(save_name, 'w') as json_file:
-                    json.dump(dataset_results, json_file, indent=4)
+                with open(save_name, 'wb') as json_file:
+                    json_file.write(orjson.dumps(dataset_results, option=orjson.OPT_INDENT_2))
                 end_time = time.time()
 
                 elapsed_time = end_time - start_time
                 print(f"Runtime for {selected_qa.replace('.json', '')} with {selected_image} : {elapsed_time:.2f} seconds")
 
         print('###')
+
+    loop.run_until_complete(client.close())
+    loop.close()
+
+    if response_cache is not None:
+        response_cache.close()
@@ -11,7 +11,7 @@ Prerequisites:
 2. You must download the JanusPro model "Janus-Pro-7B" from HugginfFace and place it in a subdirectory called `models`.
 3. You must download the MRIP Benchmark dataset.
 4. Required Python packages:
-    - Built-in: `os`, `sys`, `json`, `random`, `time`
+    - Built-in: `os`, `sys`, `json`, `random`, `time`, `functools`, `concurrent.futures`
     - External: `torch`, `PIL` (Pillow), `transformers`, `janus`
 
 
@@ -21,6 +21,9 @@ Usage Instructions:
    1.1 Set `dataset_dir` to the path where your dataset is stored.
    1.2 Set `RESULTS_ROOT` to the directory where you want to save the results.
    1.3 Select the experiment you want to run in the `experiments` list (e.g., ['RQ2']).
+   1.4 Set `BATCH_SIZE` to the number of images answered per forward pass (lower it if the GPU runs out of memory).
+   1.5 Set `MAX_NEW_TOKENS` to the maximum answer length in tokens (the model should answer with one character).
+   1.6 Optional: set `COMPILE_MODEL = True` in the "Model" section to compile the language model with `torch.compile`.
 2. Run the script.
 3. For each task, a dedicated results folder will be created, and responses will be saved in
    JSON format for each run (3 runs per task by default).
@@ -35,6 +38,8 @@ Functionality Summary:
 3. Model Call Execution:
    - A structured prompt is sent to the model with the image
      and corresponding question.
+   - `BATCH_SIZE` images are answered together in one `generate` call.
+   - The images of the next batch are loaded in a background thread while the GPU answers the current one.
    - Responses are collected and stored.
 4. Results Storage:
    - Results are saved as JSON files with structured metadata.
@@ -53,6 +58,8 @@ import sys
 import json
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import torch
 from transformers import AutoModelForCausalLM
@@ -60,6 +67,25 @@ from janus.models import MultiModalityCausalLM, VLChatProcessor
 from janus.utils.io import load_pil_images
 
 
+@lru_cache(maxsize=None)
+def load_qa_index(json_dir):
+    """
+    Loads a QA JSON file once and indexes it by image filename.
+
+    Args:
+        json_dir (str): The path to the JSON file containing question-answer data.
+
+    Returns:
+        dict[str, list[dict]]: The 'question_answer' entries of every image, keyed by its filename.
+
+    The result is cached per path, so every image of every run reuses the same parsed file.
+    """
+    with open(json_dir, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+
+    return {entry['filename']: entry['question_answer'] for entry in data}
+
+
 def get_qa(img_file_name, json_dir):
     """
     Retrieves the question-answer pairs for a given image file from a JSON dataset.
@@ -72,7 +98,7 @@ def get_qa(img_file_name, json_dir):
         list[dict]: A list of dictionaries, each containing a 'question' and an 'answer'.
 
     The function performs the following steps:
-    1. Loads the JSON file from the provided directory.
+    1. Loads the JSON file from the provided directory (only once, see `load_qa_index()`).
     2. Finds the entry that matches the given image filename.
     3. Extracts and returns the associated question-answer pairs.
 
@@ -83,97 +109,152 @@ def get_qa(img_file_name, json_dir):
             print(f"Q: {qa['question']}\nA: {qa['answer']}")
         ```
     """
-    with open(json_dir, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-
-    target_filename = img_file_name
-    result = next((entry['question_answer']
-                   for entry in data if entry['filename'] == target_filename), None)
+    result = load_qa_index(json_dir).get(img_file_name)
 
     questions_answers = [{'question': entry['question'],
                           'answer': entry['answer']} for entry in result]
     return questions_answers
 
 
-def make_model_call(model, questions_data, original_image_path, additional_question):
+def pick_other_image(png_images, idx):
     """
-    Calls the model with a medical image and a question about its content.
+    Randomly picks an image other than `png_images[idx]` for the example question.
+
+    Args:
+        png_images (list[str]): The image filenames (at least two).
+        idx (int): The index of the current image.
+
+    Returns:
+        str: The filename of the picked image.
+
+    Draws an index from the N-1 other positions and skips over `idx`, instead of
+    building the list of all other images. `random.choice` on that list draws
+    `randrange(N-1)` as well, so the same seed picks the same images.
+    """
+    j = random.randrange(len(png_images) - 1)
+    if j >= idx:
+        j += 1
+    return png_images[j]
+
+
+def prepare_batch(batch):
+    """
+    Builds the prompts of a batch and loads and preprocesses its images (CPU side of a model call).
+
+    Args:
+        batch (list[tuple]): The batch as passed to `make_model_call()`.
+
+    Returns:
+        tuple[list[str], list]: The prompt and the `VLChatProcessor` output of every element of `batch`.
+
+    Runs without the GPU, so the next batch can be prepared in a background thread
+    while the model answers the current one (see `make_model_call()`).
+    """
+
+    prompts = []
+    prepare_list = []
+
+    for questions_data, original_image_path, additional_question in batch:
+        prompt = (
+            "The image is a 2D axial slice of an abdominal CT scan with soft tissue windowing. "
+            "Answer strictly with '1' for Yes or '0' for No. No explanations, no additional text. "
+            "Your output must contain exactly one character: '1' or '0'."
+            "Ignore anatomical correctness; focus solely on what the image shows.\n"
+            "Example:\n"
+            # dynamic part of the prompt
+            f"Q: {additional_question['question']} A: {additional_question['answer']}\n"
+            "Now answer the real question:\n\n"
+            f"Q: {questions_data['question']}"
+        )
+
+        conversation = [
+            {
+                "role": "<|User|>",
+                "content": f"{prompt}\n<image_placeholder>",
+                "images": [f"{original_image_path}"],
+            },
+            {"role": "<|Assistant|>", "content": ""},
+        ]
+
+        pil_images = load_pil_images(conversation)
+        prompts.append(prompt)
+        prepare_list.append(vl_chat_processor.process_one(
+            conversations=conversation, images=pil_images))
+
+    return prompts, prepare_list
+
+
+def make_model_call(model, batch, prepared=None, max_new_tokens=8):
+    """
+    Calls the model with a batch of medical images, each with a question about its content.
 
     Args:
         model (MultiModalityCausalLM): The loaded model.
-        questions_data (dict): A dictionary containing:
-            - 'question' (str): The question to ask about the image.
-            - 'answer' (str): The expected answer.
-        original_image_path (str): The path to the image.
-        additional_question (dict): A dictionary containing:
-            - 'question' (str): A sample question to demonstrate the response format.
-            - 'answer' (str): The expected response format ('1' or '0').
+        batch (list[tuple]): One `(questions_data, original_image_path, additional_question)`
+            tuple per image, with:
+            - questions_data (dict): A dictionary containing:
+                - 'question' (str): The question to ask about the image.
+                - 'answer' (str): The expected answer.
+            - original_image_path (str): The path to the image.
+            - additional_question (dict): A dictionary containing:
+                - 'question' (str): A sample question to demonstrate the response format.
+                - 'answer' (str): The expected response format ('1' or '0').
+        prepared (tuple | None): The output of `prepare_batch(batch)` if it was already
+            computed (e.g. prefetched in a background thread); computed here otherwise.
+        max_new_tokens (int): The maximum number of generated tokens per answer. The prompt asks
+            for a single character, so a few tokens leave enough room for formatting.
 
     Returns:
-        list[dict]: A list containing a single dictionary with:
+        list[list[dict]]: For every element of `batch` (same order), a list containing
+            a single dictionary with:
             - 'question' (str): The question asked.
             - 'model_answer' (str): The AI-generated answer.
             - 'expected_answer' (str): The expected answer for comparison.
             - 'entire_prompt' (str): The full prompt used in the API call.
 
-    The function constructs a strict yes/no prompt for the model, ensuring 
+    `prepare_batch()` constructs a strict yes/no prompt for the model, ensuring 
     a binary response ('1' for Yes, '0' for No). It provides the image as it's 
-    path along with the textual question. The model response is then stored 
-    along with the original question and expected answer.
+    path along with the textual question. All prompts of the batch are left-padded
+    to the same length and answered by a single `generate` call. The model responses
+    are then stored along with the original questions and expected answers.
     """
 
-    results = []
-
-    prompt = (
-        "The image is a 2D axial slice of an abdominal CT scan with soft tissue windowing. "
-        "Answer strictly with '1' for Yes or '0' for No. No explanations, no additional text. "
-        "Your output must contain exactly one character: '1' or '0'."
-        "Ignore anatomical correctness; focus solely on what the image shows.\n"
-        "Example:\n"
-        # dynamic part of the prompt
-        f"Q: {additional_question['question']} A: {additional_question['answer']}\n"
-        "Now answer the real question:\n\n"
-        f"Q: {questions_data['question']}"
-    )
+    if prepared is None:
+        prepared = prepare_batch(batch)
+    prompts, prepare_list = prepared
 
-    conversation = [
-        {
-            "role": "<|User|>",
-            "content": f"{prompt}\n<image_placeholder>",
-            "images": [f"{original_image_path}"],
-        },
-        {"role": "<|Assistant|>", "content": ""},
-    ]
-
-    pil_images = load_pil_images(conversation)
-    prepare_inputs = vl_chat_processor(
-        conversations=conversation, images=pil_images, force_batchify=True
-    ).to(vl_gpt.device)
-
-    inputs_embeds = vl_gpt.prepare_inputs_embeds(**prepare_inputs)
-
-    outputs = vl_gpt.language_model.generate(
-        inputs_embeds=inputs_embeds,
-        attention_mask=prepare_inputs.attention_mask,
-        pad_token_id=tokenizer.eos_token_id,
-        bos_token_id=tokenizer.bos_token_id,
-        eos_token_id=tokenizer.eos_token_id,
-        max_new_tokens=512,
-        do_sample=False,
-        use_cache=True,
-    )
+    # one left-padded batch for all prompts
+    prepare_inputs = vl_chat_processor.batchify(prepare_list).to(vl_gpt.device)
+
+    with torch.inference_mode():  # no autograd bookkeeping during inference
+        inputs_embeds = vl_gpt.prepare_inputs_embeds(**prepare_inputs)
+
+        outputs = vl_gpt.language_model.generate(
+            inputs_embeds=inputs_embeds,
+            attention_mask=prepare_inputs.attention_mask,
+            pad_token_id=tokenizer.eos_token_id,
+            bos_token_id=tokenizer.bos_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            use_cache=True,
+        )
 
-    model_output = tokenizer.decode(
-        outputs[0].cpu().tolist(), skip_special_tokens=True)
+    # generate() with inputs_embeds returns only the new tokens, so the whole (small) output is
+    # copied to the CPU in one transfer and decoded at once
+    model_outputs = tokenizer.batch_decode(
+        outputs.cpu().tolist(), skip_special_tokens=True)
 
-    results.append({
-        "question": questions_data['question'],
-        "model_answer": model_output,
-        "expected_answer": questions_data['answer'],
-        "entire_prompt": prompt
-    })
+    batch_results = []
+    for (questions_data, _, _), prompt, model_output in zip(batch, prompts, model_outputs):
+        batch_results.append([{
+            "question": questions_data['question'],
+            "model_answer": model_output,
+            "expected_answer": questions_data['answer'],
+            "entire_prompt": prompt
+        }])
 
-    return results
+    return batch_results
 
 
 if __name__ == "__main__":
@@ -191,6 +272,11 @@ if __name__ == "__main__":
         model_path, trust_remote_code=True
     )
     vl_gpt = vl_gpt.to(torch.bfloat16).cuda().eval()
+
+    COMPILE_MODEL = False  # True: compile the language model with torch.compile (PyTorch >= 2.1, the first batches are slower)
+    if COMPILE_MODEL and hasattr(torch, "compile"):
+        # generate() calls forward() of the original module, so compile that one in place
+        vl_gpt.language_model.forward = torch.compile(vl_gpt.language_model.forward, dynamic=True)
     # ──────────────────────────────────────────────────────────────────────────────
 
     # ──────────────────────────────────────────────────────────────────────────────
@@ -201,8 +287,15 @@ if __name__ == "__main__":
     RESULTS_ROOT = 'results'  # path for results directory
 
     experiments = ['RQ2']  # select the experiments here: 'RQ1', 'RQ2', 'RQ3', 'AS'
+
+    BATCH_SIZE = 8  # images per generate call; lower it if the GPU runs out of memory (1: one image at a time)
+
+    MAX_NEW_TOKENS = 8  # answer length limit; the expected answer is one character (512 keeps long explanations)
     # ──────────────────────────────────────────────────────────────────────────────
 
+    # loads and preprocesses the images of the next batch while the GPU answers the current one
+    prefetch_pool = ThreadPoolExecutor(max_workers=1)
+
     for exp in experiments:
 
         if exp == 'RQ1':
@@ -258,14 +351,13 @@ if __name__ == "__main__":
                 start_time = time.time()
 
                 dataset_results = []
+                batch = []
 
-                for image in png_images:
+                for idx, image in enumerate(png_images):
                     question_data = get_qa(image, qa_file_path)
 
-                    other_images = [
-                        img for img in png_images if img != image]
-                    if other_images:
-                        random_other_image = random.choice(other_images)
+                    if len(png_images) > 1:
+                        random_other_image = pick_other_image(png_images, idx)
                         additional_question = get_qa(
                             random_other_image, qa_file_path)
                     else:
@@ -274,15 +366,25 @@ if __name__ == "__main__":
                     original_image_path = os.path.join(
                         image_files_path, image)
 
-                    results_call = make_model_call(
-                        vl_gpt, question_data[0],
-                        original_image_path,
-                        additional_question=additional_question[0])
+                    batch.append((question_data[0], original_image_path, additional_question[0]))
+
+                # the example questions are drawn above in image order, so batching keeps the random picks unchanged
+                next_prepared = prefetch_pool.submit(prepare_batch, batch[:BATCH_SIZE])
+
+                for k in range(0, len(png_images), BATCH_SIZE):
+                    prepared = next_prepared.result()
+                    if k + BATCH_SIZE < len(png_images):
+                        next_prepared = prefetch_pool.submit(
+                            prepare_batch, batch[k + BATCH_SIZE:k + 2 * BATCH_SIZE])
 
-                    dataset_results.append({
-                        "file_name": image,
-                        "results_call": results_call
-                    })
+                    batch_results = make_model_call(vl_gpt, batch[k:k + BATCH_SIZE], prepared,
+                                                    max_new_tokens=MAX_NEW_TOKENS)
+
+                    for image, results_call in zip(png_images[k:k + BATCH_SIZE], batch_results):
+                        dataset_results.append({
+                            "file_name": image,
+                            "results_call": results_call
+                        })
 
                 results_file_name = f"{selected_qa.replace('.json', '')}_{mo_file_name_appendix}_add_run_{i}.json"
 
@@ -298,3 +400,5 @@ if __name__ == "__main__":
 
                 elapsed_time = end_time - start_time
                 print(f"Runtime for {selected_qa.replace('.json', '')} with {selected_image} : {elapsed_time:.2f} seconds")
+
+    prefetch_pool.shutdown()
@@ -13,7 +13,7 @@ Prerequisites:
 3. You must download the MRIP Benchmark dataset.
 4. Required Python packages:
     - Built-in: `os`, `sys`, `json`, `random`, `time`
-    - External: `torch`, `PIL` (Pillow), `transformers`
+    - External: `torch`, `PIL` (Pillow), `numpy`, `transformers`
 
 
 Usage Instructions:
@@ -56,6 +56,7 @@ import random
 import torch
 import time
 from PIL import Image
+import numpy as np
 from transformers import MllamaForConditionalGeneration, AutoProcessor
 
 
@@ -97,8 +98,8 @@ def normalize_16bit_to_8bit(image):
         PIL.Image.Image: An 8-bit grayscale image (mode "L").
 
     The function scales pixel values from the 16-bit range (0-65535) to the 
-    8-bit range (0-255) by dividing each pixel by 256 and then converting 
-    the image to mode "L".
+    8-bit range (0-255) by shifting each pixel right by 8 bits (integer division 
+    by 256) in a single NumPy pass and building a mode "L" image from the result.
 
     Example:
         ```python
@@ -109,9 +110,8 @@ def normalize_16bit_to_8bit(image):
         img_8bit.save("example_8bit.png")
         ```
     """
-    normalized_image = image.point(
-        lambda x: (x / 256))
-    return normalized_image.convert("L")
+    pixels = np.asarray(image, dtype=np.uint16)
+    return Image.fromarray((pixels >> 8).astype(np.uint8), mode="L")
 
 
 def ensure_rgb(image):
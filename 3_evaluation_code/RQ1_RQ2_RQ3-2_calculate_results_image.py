@@ -27,61 +27,95 @@ Functionality Summary:
 - Accuracy and F1 scores are computed per run and averaged across all three runs.
 """
 
-import json, os, re
+import os, re
+from concurrent.futures import ProcessPoolExecutor
 from statistics import mean, stdev
 from typing import List, Dict, Any
 
+import numpy as np                 # pip install numpy
+import orjson                      # pip install orjson
 import openpyxl                    # pip install openpyxl
 from openpyxl import Workbook
-from sklearn.metrics import accuracy_score, f1_score
 
 
 # ──────────────────────────────────────────────────────────────────────────────
-#  Basic helpers: safe stdev
+#  Basic helpers: safe stdev, accuracy & F1
 # ──────────────────────────────────────────────────────────────────────────────
 def safe_stdev(x: List[float]) -> float:
     return stdev(x) if len(x) > 1 else 0.0
 
 
+def binary_scores(targs: np.ndarray, preds: np.ndarray) -> tuple[float, float]:
+    # same results as sklearn's accuracy_score / f1_score(zero_division=0)
+    if len(targs) == 0:
+        return float('nan'), 0.0
+    tp = int(((preds == 1) & (targs == 1)).sum())
+    fp = int(((preds == 1) & (targs == 0)).sum())
+    fn = int(((preds == 0) & (targs == 1)).sum())
+    acc = float((preds == targs).mean())
+    f1  = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.0
+    return acc, f1
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 #  Fallback direction parser & answer heuristics
 # ──────────────────────────────────────────────────────────────────────────────
+DIRECTION_PAIRS: tuple[tuple[str, str], ...] = (("above", "below"), ("below", "above"),
+                                                 ("left", "right"), ("right", "left"))
+
+
 def parse_spatial_relation(q: str, a: str) -> int | None:
     ql, al = q.lower(), a.lower()
-    for d, opp in [("above", "below"), ("below", "above"),
-                   ("left", "right"), ("right", "left")]:
+    for d, opp in DIRECTION_PAIRS:
         if d in ql:
             if d in al:   return 1
             if opp in al: return 0
     return None
 
 
-def parse_model_answer(ans: str, q: str, prompt: str) -> tuple[int | None, str | None]:
-    import re
+_RE_DIGIT       = re.compile(r'[\(\[\{\'\"\.\s]*(0|1)[\)\]\}\'\"\.\s]*')
+_RE_YESNO       = re.compile(r'[\(\[\{\'\"\.\s]*(yes|no)[\)\]\}\'\"\.\s]*', re.I)
+_RE_TOKEN_START = re.compile(r'^[\(\[\{\'\"\.\s]*(0|1|yes|no)', re.I)
+_RE_TOKEN_END   = re.compile(r'(0|1|yes|no)[\)\]\}\'\"\.\s]*$', re.I)
+_RE_PUNCT       = re.compile(r'[.!?]')
+_RE_SENT        = re.compile(r'[^.!?]+[.!?]?')
+_RE_ANSWER      = re.compile(r'(?:answer|correct answer|final answer|solution|response)'
+                             r'(?: is|:)?\s*([10])', re.I)
+
+
+# module-level helpers instead of closures re-created on every parse_model_answer call
+def sdigit(s: str) -> str | None:
+    m = _RE_DIGIT.fullmatch(s.strip())
+    return m.group(1) if m else None
 
-    def sdigit(s: str) -> str | None:
-        m = re.fullmatch(r'[\(\[\{\'\"\.\s]*(0|1)[\)\]\}\'\"\.\s]*', s.strip())
-        return m.group(1) if m else None
 
-    def syesno(s: str) -> str | None:
-        m = re.fullmatch(r'[\(\[\{\'\"\.\s]*(yes|no)[\)\]\}\'\"\.\s]*', s.strip(), re.I)
-        return m.group(1).lower() if m else None
+def syesno(s: str) -> str | None:
+    m = _RE_YESNO.fullmatch(s.strip())
+    return m.group(1).lower() if m else None
 
-    def se_token(s: str) -> str | None:
-        m = re.match(r'^[\(\[\{\'\"\.\s]*(0|1|yes|no)', s.strip(), re.I)
-        if m: return m.group(1).lower()
-        m = re.search(r'(0|1|yes|no)[\)\]\}\'\"\.\s]*$', s.strip(), re.I)
-        return m.group(1).lower() if m else None
 
+def se_token(s: str) -> str | None:
+    m = _RE_TOKEN_START.match(s.strip())
+    if m: return m.group(1).lower()
+    m = _RE_TOKEN_END.search(s.strip())
+    return m.group(1).lower() if m else None
+
+
+def parse_model_answer(ans: str, q: str, prompt: str) -> tuple[int | None, str | None]:
     txt = ans.strip()
 
+    # fast path: the prompt asks for exactly one character
+    if txt == "0":
+        return 0, None
+    if txt == "1":
+        return 1, None
     if (d := sdigit(txt)) in ("0", "1"):
         return int(d), None
     if (yn := syesno(txt)) in ("yes", "no"):
         return 1 if yn == "yes" else 0, None
     if (tok := se_token(txt)) is not None:
         return 1 if tok in ("1", "yes") else 0, None
-    if ("\n" not in txt) and (len(re.findall(r'[.!?]', txt)) <= 1) and (len(txt) < 150):
+    if ("\n" not in txt) and (len(_RE_PUNCT.findall(txt)) <= 1) and (len(txt) < 150):
         if (sr := parse_spatial_relation(q, txt)) is not None:
             return sr, None
 
@@ -91,11 +125,10 @@ def parse_model_answer(ans: str, q: str, prompt: str) -> tuple[int | None, str |
         ls = l.strip()
         if ls:
             cleaned = cleaned.replace(ls, "")
-    m = re.search(r'[^.!?]+[.!?]?', cleaned)
+    m = _RE_SENT.search(cleaned)
     if m and (sr2 := parse_spatial_relation(q, m.group(0).strip())) is not None:
         return sr2, cleaned
-    m = re.search(r'(?:answer|correct answer|final answer|solution|response)'
-                  r'(?: is|:)?\s*([10])', cleaned, re.I)
+    m = _RE_ANSWER.search(cleaned)
     if m:
         return 1 if m.group(1) == "1" else 0, cleaned
     return None, cleaned
@@ -105,11 +138,11 @@ def parse_model_answer(ans: str, q: str, prompt: str) -> tuple[int | None, str |
 #  Evaluate ONE run file
 # ──────────────────────────────────────────────────────────────────────────────
 def evaluate_run(json_path: str) -> Dict[str, Any]:
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    with open(json_path, 'rb') as f:
+        data = orjson.loads(f.read())
 
     preds, targs = [], []
-    correct = incorrect = unsure = 0
+    unsure = 0
 
     for entry in data:
         for call in entry["results_call"]:
@@ -120,15 +153,15 @@ def evaluate_run(json_path: str) -> Dict[str, Any]:
             if pred is None:                       # treat unsure as WRONG
                 pred = 1 - exp
                 unsure += 1
-            if pred == exp:
-                correct += 1
-            else:
-                incorrect += 1
             preds.append(pred)
             targs.append(exp)
 
-    acc = accuracy_score(targs, preds)
-    f1  = f1_score(targs, preds, zero_division=0)
+    preds = np.asarray(preds, dtype=np.int8)
+    targs = np.asarray(targs, dtype=np.int8)
+
+    correct   = int((preds == targs).sum())
+    incorrect = len(targs) - correct
+    acc, f1   = binary_scores(targs, preds)
 
     return {
         "accuracy":       acc,
@@ -142,9 +175,7 @@ def evaluate_run(json_path: str) -> Dict[str, Any]:
 # ──────────────────────────────────────────────────────────────────────────────
 #  Aggregate three runs of the same experiment
 # ──────────────────────────────────────────────────────────────────────────────
-def process_runs(run_files: List[str]) -> Dict[str, Any]:
-    run_metrics = [evaluate_run(fp) for fp in run_files]
-
+def aggregate_runs(run_metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
     accs = [rm["accuracy"] for rm in run_metrics]
     f1s  = [rm["f1"]       for rm in run_metrics]
 
@@ -217,18 +248,25 @@ def main():
     if not os.path.isdir(answer_files_dir):
         raise FileNotFoundError(f"Answers directory not found: {answer_files_dir}")
 
-    json_files = [os.path.join(answer_files_dir, f)
-                  for f in os.listdir(answer_files_dir)
-                  if f.lower().endswith(".json")]
+    with os.scandir(answer_files_dir) as it:
+        json_files = [e.path for e in it
+                      if e.is_file() and e.name.lower().endswith(".json")]
     if not json_files:
         raise RuntimeError("No *.json files found in the Answers directory.")
 
     grouped = group_by_base(json_files)
     parent  = os.path.abspath(os.path.join(answer_files_dir, os.pardir))
 
-    for base, run_paths in grouped.items():
-        run_paths = sorted(run_paths)  # ensure run_0, run_1, run_2 order
-        res = process_runs(run_paths)
+    # evaluate all run files (of all bases) in parallel
+    with ProcessPoolExecutor(max_workers=min(len(json_files), os.cpu_count() or 1)) as ex:
+        futures = {base: [ex.submit(evaluate_run, fp)
+                          for fp in sorted(run_paths)]  # ensure run_0, run_1, run_2 order
+                   for base, run_paths in grouped.items()}
+        run_metrics = {base: [fut.result() for fut in futs]
+                       for base, futs in futures.items()}
+
+    for base, metrics in run_metrics.items():
+        res = aggregate_runs(metrics)
 
         wb = Workbook()
         ws = wb.active
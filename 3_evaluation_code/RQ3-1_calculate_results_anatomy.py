@@ -44,22 +44,39 @@ Notes:
 """
 
 
-import json, os, re, math
+import os, re, math
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from statistics import mean, stdev
 from typing import List, Dict, Any
 
+import ijson                          # pip install ijson
+import numpy as np                    # pip install numpy
+import orjson                         # pip install orjson
 import openpyxl                       # pip install openpyxl
 from openpyxl import Workbook
-from sklearn.metrics import accuracy_score, f1_score
 
 
 # ──────────────────────────────────────────────────────────────────────────────
-#  Helpers: safe stdev
+#  Helpers: safe stdev, accuracy & F1
 # ──────────────────────────────────────────────────────────────────────────────
 def safe_stdev(vals: List[float]) -> float:
     return stdev(vals) if len(vals) > 1 else 0.0
 
 
+def binary_scores(targs: np.ndarray, preds: np.ndarray) -> tuple[float, float]:
+    # same results as sklearn's accuracy_score / f1_score(zero_division=0)
+    if len(targs) == 0:
+        return float('nan'), 0.0
+    tp = int(((preds == 1) & (targs == 1)).sum())
+    fp = int(((preds == 1) & (targs == 0)).sum())
+    fn = int(((preds == 0) & (targs == 1)).sum())
+    acc = float((preds == targs).mean())
+    f1  = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.0
+    return acc, f1
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 #  Direction fallback & answer parser
 # ──────────────────────────────────────────────────────────────────────────────
@@ -74,50 +91,36 @@ def parse_spatial_relation(question: str, answer: str) -> int | None:
     return None
 
 
-def parse_model_answer(ans: str, q: str, prompt: str) -> tuple[int | None, str | None]:
-    import re
-
-    def sdigit(s: str) -> str | None:
-        m = re.match(r'^[\(\[\{\'\"\.\s]*(0|1)[\)\]\}\'\"\.\s]*$', s.strip())
-        return m.group(1) if m else None
-
-    def syesno(s: str) -> str | None:
-        m = re.match(r'^[\(\[\{\'\"\.\s]*(yes|no)[\)\]\}\'\"\.\s]*$', s.strip(), re.I)
-        return m.group(1).lower() if m else None
+# One pass for the single-token answers: a token (0/1/yes/no) at the start of the
+# answer, or failing that at its end. This covers the former single digit, yes/no
+# and start/end token checks, which always agreed whenever the first two matched.
+_RE_TOKEN    = re.compile(r'^[\(\[\{\'\"\.\s]*(?P<head>0|1|yes|no)'
+                          r'|(?P<tail>0|1|yes|no)[\)\]\}\'\"\.\s]*$', re.I)
+_RE_PUNCT    = re.compile(r'[.!?]')
+_RE_SENT     = re.compile(r'[^.!?]+[.!?]?')
+_RE_ANSWER   = re.compile(r'(?:answer|correct answer|final answer|solution|response)'
+                          r'(?: is|:)?\s*([10])', re.I)
 
-    def se_token(s: str) -> str | None:
-        t = s.strip()
-        m = re.match(r'^[\(\[\{\'\"\.\s]*(0|1|yes|no)', t, re.I) or \
-            re.search(r'(0|1|yes|no)[\)\]\}\'\"\.\s]*$', t, re.I)
-        return m.group(1).lower() if m else None
 
+def parse_model_answer(ans: str, q: str, prompt: str) -> tuple[int | None, str | None]:
     txt = ans.strip()
-    # A) single digit
-    if (d := sdigit(txt)) in ("0", "1"):
-        return int(d), None
-    # B) yes/no
-    if (y := syesno(txt)) == "yes":
-        return 1, None
-    if y == "no":
-        return 0, None
-    # C) token at start/end
-    if (t := se_token(txt)):
-        return 1 if t in ("1", "yes") else 0, None
-    # D) short sentence?
-    if ("\n" not in txt) and (len(re.findall(r'[.!?]', txt)) <= 1) and (len(txt) < 150):
+    # A) single token (digit or yes/no) at start/end
+    if (m := _RE_TOKEN.search(txt)):
+        return 1 if (m["head"] or m["tail"]).lower() in ("1", "yes") else 0, None
+    # B) short sentence?
+    if ("\n" not in txt) and (len(_RE_PUNCT.findall(txt)) <= 1) and (len(txt) < 150):
         if (sr := parse_spatial_relation(q, txt)) is not None:
             return sr, None
-    # E) strip prompt repetitions + heuristics
+    # C) strip prompt repetitions + heuristics
     cleaned = txt
     for l in prompt.splitlines():
         ls = l.strip()
         if ls:
             cleaned = cleaned.replace(ls, "")
-    m = re.search(r'[^.!?]+[.!?]?', cleaned)
+    m = _RE_SENT.search(cleaned)
     if m and (sr2 := parse_spatial_relation(q, m.group(0).strip())) is not None:
         return sr2, cleaned
-    m = re.search(r'(?:answer|correct answer|final answer|solution|response)'
-                  r'(?: is|:)?\s*([10])', cleaned, re.I)
+    m = _RE_ANSWER.search(cleaned)
     if m:
         return 1 if m.group(1) == "1" else 0, cleaned
     return None, cleaned
@@ -126,16 +129,18 @@ def parse_model_answer(ans: str, q: str, prompt: str) -> tuple[int | None, str |
 # ──────────────────────────────────────────────────────────────────────────────
 #  Load centre coordinates & name conversion
 # ──────────────────────────────────────────────────────────────────────────────
-def load_centres(path: str) -> Dict[str, Dict[str, tuple]]:
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    out: Dict[str, Dict[str, tuple]] = {}
+def load_centres(path: str) -> Dict[str, Dict[str, float]]:
+    with open(path, 'rb') as f:
+        data = orjson.loads(f.read())
+    out: Dict[str, Dict[str, float]] = {}
     for e in data:
-        out[e["filename"]] = {li["class_name"]: (li["center_x"], li["center_y"])
+        # only the x coordinate is needed for left/right questions
+        out[e["filename"]] = {li["class_name"]: li["center_x"]
                               for li in e.get("label_info", [])}
     return out
 
 
+@lru_cache(maxsize=2048)  # few distinct structure names, repeated in every run
 def canon_name(name: str) -> str:
     name = name.lower().strip()
     parts = name.split()
@@ -149,24 +154,30 @@ def canon_name(name: str) -> str:
 # ──────────────────────────────────────────────────────────────────────────────
 #  Evaluate one JSON run file
 # ──────────────────────────────────────────────────────────────────────────────
-def eval_run(json_path: str,
-             centre_map: Dict[str, Dict[str, tuple]]) -> Dict[str, Any]:
+_RE_LEFT_RIGHT = re.compile(r'\b(?:left|right)\b', re.I)
+_RE_QUESTION   = re.compile(r'is the (.+?) to the (left|right) of the (.+?)\?', re.I)
+
 
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+def iter_entries(json_path: str):
+    # stream the answers list entry by entry instead of loading the whole file
+    with open(json_path, 'rb') as f:
+        yield from ijson.items(f, 'item')
 
-    anat_preds, anat_targs = [], []
-    img_preds,  img_targs  = [], []
 
-    anat_corr = anat_wrong = anat_tot = 0
-    img_corr  = img_wrong  = img_tot  = 0
+def eval_run(json_path: str,
+             centre_map: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
 
-    for entry in data:
+    # contiguous int8 buffers (the answers are streamed, so their number is not known upfront)
+    anat_preds, anat_targs = array('b'), array('b')
+    img_preds,  img_targs  = array('b'), array('b')
+
+    for entry in iter_entries(json_path):
         fn = entry["file_name"]
         for r in entry["results_call"]:
             q  = r.get("question", "")
-            if ("left" not in q.lower()) and ("right" not in q.lower()):
+            if not _RE_LEFT_RIGHT.search(q):
                 continue  # only left/right subset
+            ql = q.lower()
 
             exp = r.get("expected_answer")
             pa, _ = parse_model_answer(r.get("model_answer", ""), q, r.get("entire_prompt", ""))
@@ -175,9 +186,6 @@ def eval_run(json_path: str,
 
             # ── Image view ────────────────────
             if exp is not None:
-                img_tot += 1
-                img_corr += int(pa == exp)
-                img_wrong += int(pa != exp)
                 img_preds.append(pa)
                 img_targs.append(exp)
 
@@ -185,7 +193,7 @@ def eval_run(json_path: str,
             obj1 = r.get("object1_name")
             obj2 = r.get("object2_name")
             if not obj1 or not obj2:
-                m = re.search(r'is the (.+?) to the (left|right) of the (.+?)\?', q, re.I)
+                m = _RE_QUESTION.search(q)
                 if m:
                     obj1, obj2 = m.group(1).strip(), m.group(3).strip()
             if fn not in centre_map or not obj1 or not obj2:
@@ -194,20 +202,27 @@ def eval_run(json_path: str,
             k1, k2 = canon_name(obj1), canon_name(obj2)
             if k1 not in cm or k2 not in cm:
                 continue
-            (cx1, _), (cx2, _) = cm[k1], cm[k2]
-            real = 1 if (" to the left of " in q.lower() and cx1 > cx2) or \
-                         (" to the right of " in q.lower() and cx1 < cx2) else 0
-            anat_tot += 1
-            anat_corr += int(pa == real)
-            anat_wrong += int(pa != real)
+            cx1, cx2 = cm[k1], cm[k2]
+            real = 1 if (" to the left of " in ql and cx1 > cx2) or \
+                         (" to the right of " in ql and cx1 < cx2) else 0
             anat_preds.append(pa)
             anat_targs.append(real)
 
+    anat_p, anat_t = np.frombuffer(anat_preds, dtype=np.int8), np.frombuffer(anat_targs, dtype=np.int8)
+    img_p,  img_t  = np.frombuffer(img_preds, dtype=np.int8),  np.frombuffer(img_targs, dtype=np.int8)
+
+    # Counts (tallied once over the buffers instead of per row)
+    anat_tot   = len(anat_t)
+    anat_corr  = int((anat_p == anat_t).sum())
+    anat_wrong = anat_tot - anat_corr
+    img_tot    = len(img_t)
+    img_corr   = int((img_p == img_t).sum())
+    img_wrong  = img_tot - img_corr
+
     # Scores
-    anat_acc = accuracy_score(anat_targs, anat_preds) if anat_targs else float('nan')
-    anat_f1  = f1_score(anat_targs, anat_preds, zero_division=0) if anat_targs else float('nan')
-    img_acc  = accuracy_score(img_targs, img_preds)  if img_targs else float('nan')
-    img_f1   = f1_score(img_targs, img_preds, zero_division=0)  if img_targs else float('nan')
+    nan = float('nan')
+    anat_acc, anat_f1 = binary_scores(anat_t, anat_p) if anat_tot else (nan, nan)
+    img_acc,  img_f1  = binary_scores(img_t, img_p)   if img_tot  else (nan, nan)
 
     return {
         "anat_acc":          anat_acc,
@@ -223,6 +238,19 @@ def eval_run(json_path: str,
     }
 
 
+# worker side: the centre map is sent once per process instead of once per run file
+_worker_centre_map: Dict[str, Dict[str, float]] = {}
+
+
+def _init_worker(centre_map: Dict[str, Dict[str, float]]) -> None:
+    global _worker_centre_map
+    _worker_centre_map = centre_map
+
+
+def _eval_run_worker(json_path: str) -> Dict[str, Any]:
+    return eval_run(json_path, _worker_centre_map)
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 #  Aggregate the three runs
 # ──────────────────────────────────────────────────────────────────────────────
@@ -250,9 +278,8 @@ def aggregate_runs(run_results: List[Dict[str, Any]]) -> Dict[str, Any]:
 #  Write Excel (single row)
 # ──────────────────────────────────────────────────────────────────────────────
 def write_excel(res: Dict[str, Any], out_path: str) -> None:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Results"
+    wb = Workbook(write_only=True)  # rows are streamed straight into the xlsx file
+    ws = wb.create_sheet("Results")
 
     hdr = [
         "Anatomy_Accuracy_Mean", "Anatomy_Accuracy_Std",
@@ -289,6 +316,9 @@ def write_excel(res: Dict[str, Any], out_path: str) -> None:
 # ──────────────────────────────────────────────────────────────────────────────
 #  MAIN
 # ──────────────────────────────────────────────────────────────────────────────
+_RE_RUN_FILE = re.compile(r'^(.*)_run_(\d+)\.json$', re.I)
+
+
 def main():
     # Update the paths below to your local setup
     # ── Paths  ─────────────────────────────────────
@@ -319,26 +349,32 @@ def main():
     centre_map = load_centres(centres_js)
 
     # collect all *_run_<n>.json files inside answer_files_dir
-    json_files = [os.path.join(answer_files_dir, f)
-                  for f in os.listdir(answer_files_dir)
-                  if f.endswith(".json") and not f.startswith("Result_")]
+    with os.scandir(answer_files_dir) as it:
+        json_files = [e.path for e in it
+                      if e.is_file() and e.name.endswith(".json") and not e.name.startswith("Result_")]
     if not json_files:
         raise RuntimeError("No run JSON files found in the Answers directory.")
 
     # group by base using "…_run_<n>.json" pattern
     grouped: Dict[str, List[str]] = {}
-    pat = re.compile(r'^(.*)_run_(\d+)\.json$', re.I)
     for fp in json_files:
-        m = pat.match(os.path.basename(fp))
+        m = _RE_RUN_FILE.match(os.path.basename(fp))
         if not m:
             raise RuntimeError(f"File does not match '*_run_<n>.json' pattern: {fp}")
         grouped.setdefault(m.group(1), []).append(fp)
 
     parent_dir = os.path.dirname(answer_files_dir)  # one level up for output
 
-    for base_name, run_paths in grouped.items():
-        run_paths = sorted(run_paths)  # ensure run_0, run_1, run_2 order
-        run_results = [eval_run(p, centre_map) for p in run_paths]
+    # evaluate all run files (of all bases) in parallel
+    with ProcessPoolExecutor(max_workers=min(len(json_files), os.cpu_count() or 1),
+                             initializer=_init_worker, initargs=(centre_map,)) as ex:
+        futures = {base_name: [ex.submit(_eval_run_worker, p)
+                               for p in sorted(run_paths)]  # ensure run_0, run_1, run_2 order
+                   for base_name, run_paths in grouped.items()}
+        all_results = {base_name: [fut.result() for fut in futs]
+                       for base_name, futs in futures.items()}
+
+    for base_name, run_results in all_results.items():
         agg_res = aggregate_runs(run_results)
 
         # filename: generic if only one base, else include base name